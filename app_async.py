@@ -2,18 +2,31 @@
 Flask Application with Celery + Supabase Integration
 非同期処理対応のFlaskアプリケーション
 """
-from flask import Flask, request, jsonify, session, send_from_directory, render_template
+from flask import Flask, Request, Response, request, jsonify, session, send_from_directory, render_template
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from werkzeug.exceptions import NotFound, RequestEntityTooLarge
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
-from supabase_client import supabase_client
+from supabase_client import get_supabase_client, now_iso, STORAGE_BUCKET, STORAGE_URI_PREFIX
+from task_cache import task_cache
 from celery_app import get_celery_app
 import async_tasks
 import os
 import uuid
+import hashlib
 import logging
+import mimetypes
 from datetime import datetime
+from typing import Optional
+from urllib.parse import quote, unquote
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # orjson がなければ標準のjsonを使用
+    orjson = None
+
 # Load environment variables
 load_dotenv()
 
@@ -25,24 +38,94 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Flask app
+# 設定はインポート時に1回だけ読み込み、リクエストごとに参照し直さない
+# 大きな動画は /api/upload/video/presign で Storage に直接アップロードする
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 10485760))  # 10MB
+UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
+OUTPUT_FOLDER = os.getenv('OUTPUT_FOLDER', 'outputs')
+UPLOAD_FOLDER_ABS = os.path.abspath(UPLOAD_FOLDER)
+OUTPUT_FOLDER_ABS = os.path.abspath(OUTPUT_FOLDER)
+
+# multipart/form-data（/api/upload/image, /api/upload/video）の解析設定
+MULTIPART_FORM_MEMORY_SIZE = int(os.getenv('MULTIPART_FORM_MEMORY_SIZE', 1048576))  # ファイル以外のフィールドの上限（1MB）
+
+# ファイル部分を保存先へ直接書き込むエンドポイント -> 保存先サブディレクトリ
+MULTIPART_UPLOAD_KINDS = {
+    'upload_image': 'images',
+    'upload_video': 'videos',
+}
+
+
+class UploadRequest(Request):
+    """
+    multipartアップロードのファイル部分を保存先へ直接書き込むリクエストクラス
+
+    Werkzeugはビューの中で最初に request.files を参照した時点でフォームを解析するため、
+    セッションはすでに開かれており、保存先のパスをストリームの作成時に決められる。
+    一時ファイルへの書き出しと file.save() による2回目のコピーが不要になる。
+    保存したファイルは take_multipart_upload() で受け取る。
+    """
+
+    max_form_memory_size = MULTIPART_FORM_MEMORY_SIZE
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.saved_uploads = {}  # ファイル部分のストリーム -> (保存先パス, 保存ファイル名)
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        kind = MULTIPART_UPLOAD_KINDS.get(self.endpoint)
+        if kind is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+        file_path, stored_filename = build_upload_path(get_or_create_session_id(), kind, filename or '')
+        stream = open(file_path, 'wb+')
+        self.saved_uploads[stream] = (file_path, stored_filename)
+        return stream
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.config.update(
     SECRET_KEY=os.getenv('SECRET_KEY', 'dev-secret-key'),
-    MAX_CONTENT_LENGTH=int(os.getenv('MAX_UPLOAD_SIZE', 524288000)),  # 500MB
-    UPLOAD_FOLDER=os.getenv('UPLOAD_FOLDER', 'uploads'),
-    OUTPUT_FOLDER=os.getenv('OUTPUT_FOLDER', 'outputs'),
+    MAX_CONTENT_LENGTH=MAX_UPLOAD_SIZE,
+    UPLOAD_FOLDER=UPLOAD_FOLDER,
+    OUTPUT_FOLDER=OUTPUT_FOLDER,
 )
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """orjsonによるJSONエンコード/デコード（タスク一覧のポーリング応答を高速化）"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+# jsonify と request.get_json の両方がこのプロバイダーを使用する
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
 CORS(app)
 
 # Celery
 celery = get_celery_app()
 
 # Ensure directories exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 os.makedirs('frames', exist_ok=True)
 
+# ストリーミングアップロードの読み込み単位（1MB）
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# nginxのinternal locationの接頭辞（例: /internal）。設定するとファイル転送をnginxに任せる
+X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '').rstrip('/')
+
+# 出力・アップロードファイルのクライアントキャッシュ期間（秒）
+FILE_CACHE_MAX_AGE = 3600
+
 
 def get_or_create_session_id():
     """セッションIDを取得または生成"""
@@ -66,17 +149,7 @@ def create_task():
         params = data.get('params', {})
         user_id = get_or_create_session_id()
 
-        # Supabaseにタスクを作成
-        task = supabase_client.create_task({
-            'user_id': user_id,
-            'task_type': task_type,
-            'status': 'pending',
-            'params': params
-        })
-
-        db_task_id = task['id']
-
-        # タスクタイプに応じてCeleryタスクを起動
+        # タスクタイプに応じてCeleryタスクと引数を決定
         if task_type == 'veo_generate':
             # Veo動画生成
             image_path = params.get('image_path')
@@ -86,15 +159,13 @@ def create_task():
             if not image_path or not prompt:
                 return jsonify({'error': 'image_path and prompt are required'}), 400
 
-            celery_task = async_tasks.veo_generate_task.apply_async(
-                kwargs={
-                    'db_task_id': db_task_id,
-                    'image_path': image_path,
-                    'prompt': prompt,
-                    'duration': duration,
-                    'user_id': user_id
-                }
-            )
+            celery_task = async_tasks.veo_generate_task
+            task_kwargs = {
+                'image_path': image_path,
+                'prompt': prompt,
+                'duration': duration,
+                'user_id': user_id
+            }
 
         elif task_type == 'generate_video_from_image':
             # 画像から動画生成（デモモード）
@@ -104,14 +175,12 @@ def create_task():
             if not image_path or not prompt:
                 return jsonify({'error': 'image_path and prompt are required'}), 400
 
-            celery_task = async_tasks.generate_video_from_image_task.apply_async(
-                kwargs={
-                    'db_task_id': db_task_id,
-                    'image_path': image_path,
-                    'prompt': prompt,
-                    'user_id': user_id
-                }
-            )
+            celery_task = async_tasks.generate_video_from_image_task
+            task_kwargs = {
+                'image_path': image_path,
+                'prompt': prompt,
+                'user_id': user_id
+            }
 
         elif task_type == 'frame_extract':
             # フレーム抽出
@@ -121,28 +190,79 @@ def create_task():
             if not video_path:
                 return jsonify({'error': 'video_path is required'}), 400
 
-            celery_task = async_tasks.extract_frames_task.apply_async(
-                kwargs={
-                    'db_task_id': db_task_id,
-                    'video_path': video_path,
-                    'frame_count': frame_count,
-                    'user_id': user_id
-                }
-            )
+            celery_task = async_tasks.extract_frames_task
+            task_kwargs = {
+                'video_path': video_path,
+                'frame_count': frame_count,
+                'user_id': user_id
+            }
+
+        elif task_type == 'property_video':
+            # 物件動画生成（3クリップを並列生成して結合するワークフロー）
+            image_paths = params.get('image_paths')
+
+            if not isinstance(image_paths, list) or len(image_paths) != 3:
+                return jsonify({'error': 'image_paths must contain exactly 3 images'}), 400
+
+            # セッションIDは出力ディレクトリ名になるため、パスとして安全な名前に限定する
+            session_id = params.get('session_id')
+            if session_id:
+                session_id = secure_filename(str(session_id))
+                if not session_id:
+                    return jsonify({'error': 'Invalid session_id'}), 400
+            else:
+                session_id = str(uuid.uuid4())
+
+            celery_task = None
+            task_kwargs = {
+                'image_paths': image_paths,
+                'session_id': session_id,
+                'user_id': user_id
+            }
 
         else:
             return jsonify({'error': f'Unknown task type: {task_type}'}), 400
 
-        # CeleryタスクIDを保存
-        supabase_client.update_task(db_task_id, {
-            'celery_task_id': celery_task.id
+        # CeleryタスクIDを先に採番し、1回のINSERTで保存する
+        celery_task_id = str(uuid.uuid4())
+
+        # Supabaseにタスクを作成
+        task = get_supabase_client().create_task({
+            'user_id': user_id,
+            'task_type': task_type,
+            'status': 'pending',
+            'params': params,
+            'celery_task_id': celery_task_id
         })
 
-        logger.info(f"Task created: {db_task_id} (Celery: {celery_task.id})")
+        db_task_id = task['id']
+
+        try:
+            if celery_task is None:
+                async_tasks.start_property_video_workflow(
+                    db_task_id=db_task_id,
+                    task_id=celery_task_id,
+                    **task_kwargs
+                )
+            else:
+                celery_task.apply_async(
+                    task_id=celery_task_id,
+                    kwargs={'db_task_id': db_task_id, **task_kwargs}
+                )
+        except Exception as e:
+            # キューに投入できなかったタスクはpendingのまま残さない
+            get_supabase_client().update_task_minimal(db_task_id, {
+                'status': 'failed',
+                'error_message': f"Failed to enqueue task: {e}",
+                'error_type': type(e).__name__
+            })
+            raise
+
+        logger.info(f"Task created: {db_task_id} (Celery: {celery_task_id})")
 
         return jsonify({
             'task_id': db_task_id,
-            'celery_task_id': celery_task.id,
+            'celery_task_id': celery_task_id,
             'status': 'Task submitted successfully',
             'message': 'タスクを開始しました'
         }), 202
@@ -152,16 +272,45 @@ def create_task():
         return jsonify({'error': str(e)}), 500
 
 
+def task_etag(task: dict) -> str:
+    """
+    タスクの表示内容が変わったときだけ変化するETagを生成
+
+    Args:
+        task: タスク情報
+
+    Returns:
+        ETag値
+    """
+    fingerprint = f"{task.get('status')}:{task.get('progress')}:{task.get('current_step')}:{task.get('updated_at')}"
+    return hashlib.md5(fingerprint.encode()).hexdigest()
+
+
 @app.route('/api/tasks/<task_id>', methods=['GET'])
 def get_task_status(task_id):
-    """タスク状態を取得"""
+    """タスク状態を取得（If-None-Matchが一致すれば304を返す）"""
     try:
-        task = supabase_client.get_task(task_id)
+        task = task_cache.get_task(task_id)
 
-        if not task:
-            return jsonify({'error': 'Task not found'}), 404
+        if task is None:
+            task = get_supabase_client().get_task(task_id)
+
+            if not task:
+                return jsonify({'error': 'Task not found'}), 404
+
+            task_cache.set_task(task_id, task)
 
-        return jsonify(task)
+        etag = task_etag(task)
+
+        if request.if_none_match.contains_weak(etag):
+            # 変化がなければJSONを生成せずに304を返す
+            response = Response(status=304)
+        else:
+            response = jsonify(task)
+
+        response.set_etag(etag, weak=True)
+        response.cache_control.no_cache = True
+        return response
 
     except Exception as e:
         logger.error(f"Error getting task status: {e}", exc_info=True)
@@ -176,7 +325,11 @@ def get_tasks():
         status_filter = request.args.get('status')
         limit = int(request.args.get('limit', 50))
 
-        tasks = supabase_client.get_user_tasks(user_id, limit, status_filter)
+        tasks = task_cache.get_task_list(user_id, status_filter, limit)
+
+        if tasks is None:
+            tasks = get_supabase_client().get_user_tasks(user_id, limit, status_filter)
+            task_cache.set_task_list(user_id, status_filter, limit, tasks)
 
         return jsonify({
             'tasks': tasks,
@@ -192,7 +345,7 @@ def get_tasks():
 def cancel_task(task_id):
     """タスクをキャンセル"""
     try:
-        task = supabase_client.get_task(task_id)
+        task = get_supabase_client().get_task(task_id)
 
         if not task:
             return jsonify({'error': 'Task not found'}), 404
@@ -202,13 +355,21 @@ def cancel_task(task_id):
 
         # Celeryタスクを終了
         if task.get('celery_task_id'):
-            celery.control.revoke(task['celery_task_id'], terminate=True)
+            celery_task_ids = [task['celery_task_id']]
+
+            # 物件動画ワークフローは各クリップのタスクも終了する
+            if task.get('task_type') == 'property_video':
+                image_paths = (task.get('params') or {}).get('image_paths') or []
+                celery_task_ids += async_tasks.property_clip_task_ids(task['celery_task_id'], len(image_paths))
+
+            celery.control.revoke(celery_task_ids, terminate=True)
 
         # Supabaseを更新
-        updated_task = supabase_client.update_task(task_id, {
+        updated_task = get_supabase_client().update_task(task_id, {
             'status': 'cancelled',
-            'completed_at': datetime.utcnow().isoformat()
+            'completed_at': now_iso()
         })
+        task_cache.invalidate_task(task_id)
 
         return jsonify(updated_task)
 
@@ -221,28 +382,157 @@ def cancel_task(task_id):
 # ファイルアップロード
 # ============================================================================
 
+def build_upload_path(user_id: str, kind: str, original_filename: str):
+    """
+    アップロード先のパスを生成
+
+    Args:
+        user_id: ユーザーID
+        kind: 保存先サブディレクトリ（images / videos）
+        original_filename: クライアントから送られたファイル名
+
+    Returns:
+        (保存先パス, 保存ファイル名)
+    """
+    upload_dir = os.path.join(UPLOAD_FOLDER, user_id, kind)
+    async_tasks.ensure_dir(upload_dir)
+
+    filename = secure_filename(original_filename)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"{timestamp}_{filename}"
+    return os.path.join(upload_dir, filename), filename
+
+
+def take_multipart_upload(field: str) -> Optional[tuple]:
+    """
+    UploadRequest が保存先へ直接書き込んだファイル部分を受け取る
+
+    field 以外のファイル部分や、ファイルが選択されていない部分は削除する。
+    解析中にエラーになった場合も書きかけのファイルを残さない。
+
+    Args:
+        field: フォームのフィールド名
+
+    Returns:
+        (保存先パス, 保存ファイル名)。ファイルがなければNone
+    """
+    file = None
+    try:
+        file = request.files.get(field)
+    finally:
+        taken = None
+        for stream, saved in request.saved_uploads.items():
+            stream.close()
+            if file is not None and file.filename and file.stream is stream:
+                taken = saved
+            else:
+                try:
+                    os.remove(saved[0])
+                except OSError:
+                    pass
+        request.saved_uploads.clear()
+    return taken
+
+
+def save_request_stream(file_path: str) -> tuple:
+    """
+    リクエストボディをチャンク単位で直接ファイルへ書き込む
+
+    Werkzeugのフォームパーサー（一時ファイル経由）を通さないため、
+    大きなファイルでもディスクへのコピーは1回で済む。
+    サイズとSHA-256も同じ読み込みの中で計算する。
+
+    Args:
+        file_path: 保存先パス
+
+    Returns:
+        (書き込んだバイト数, SHA-256)
+    """
+    digest = hashlib.sha256()
+    total = 0
+    with open(file_path, 'wb') as fh:
+        while chunk := request.stream.read(UPLOAD_CHUNK_SIZE):
+            fh.write(chunk)
+            digest.update(chunk)
+            total += len(chunk)
+    return total, digest.hexdigest()
+
+
+def handle_stream_upload(kind: str):
+    """
+    生ボディのストリーミングアップロードを処理
+
+    ファイル名は X-Filename ヘッダー（URLエンコード可）から取得する。
+    """
+    original_filename = unquote(request.headers.get('X-Filename', ''))
+
+    if not secure_filename(original_filename):
+        return jsonify({'error': 'X-Filename header is required'}), 400
+
+    if request.content_length and MAX_UPLOAD_SIZE and request.content_length > MAX_UPLOAD_SIZE:
+        # ボディを読む前に拒否する
+        return jsonify({
+            'error': 'File too large',
+            'detail': 'Use /api/upload/video/presign to upload large files directly to storage'
+        }), 413
+
+    user_id = get_or_create_session_id()
+    file_path, filename = build_upload_path(user_id, kind, original_filename)
+
+    try:
+        file_size, content_hash = save_request_stream(file_path)
+    except RequestEntityTooLarge:
+        os.remove(file_path)
+        return jsonify({
+            'error': 'File too large',
+            'detail': 'Use /api/upload/video/presign to upload large files directly to storage'
+        }), 413
+    except Exception:
+        # 途中で切断された場合は不完全なファイルを残さない
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    if file_size == 0:
+        os.remove(file_path)
+        return jsonify({'error': 'Empty request body'}), 400
+
+    logger.info(f"Streamed upload ({kind}): {file_path} ({file_size} bytes)")
+
+    # サイズとハッシュを記録し、後続タスクでの再計算を省く
+    get_supabase_client().create_uploaded_file({
+        'user_id': user_id,
+        'original_filename': original_filename,
+        'stored_filename': filename,
+        'file_path': file_path,
+        'file_size': file_size,
+        'mime_type': request.mimetype or mimetypes.guess_type(filename)[0],
+        'content_hash': content_hash
+    })
+
+    return jsonify({
+        'status': 'success',
+        'file_path': file_path,
+        'filename': filename,
+        'file_size': file_size,
+        'content_hash': content_hash
+    })
+
+
 @app.route('/api/upload/image', methods=['POST'])
 def upload_image():
-    """画像をアップロード"""
+    """画像をアップロード（multipart/form-data）"""
     try:
+        # ファイル部分は解析時に保存先へ直接書き込まれる（UploadRequest）
+        saved = take_multipart_upload('image')
+
         if 'image' not in request.files:
             return jsonify({'error': 'No image file provided'}), 400
 
-        file = request.files['image']
-
-        if not file.filename:
+        if saved is None:
             return jsonify({'error': 'No file selected'}), 400
 
-        user_id = get_or_create_session_id()
-        upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], user_id, 'images')
-        os.makedirs(upload_dir, exist_ok=True)
-
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        file_path = os.path.join(upload_dir, filename)
-
-        file.save(file_path)
+        file_path, filename = saved
 
         logger.info(f"Image uploaded: {file_path}")
 
@@ -257,28 +547,30 @@ def upload_image():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/upload/image/stream', methods=['POST'])
+def upload_image_stream():
+    """画像をアップロード（生ボディのストリーミング）"""
+    try:
+        return handle_stream_upload('images')
+    except Exception as e:
+        logger.error(f"Error streaming image upload: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/upload/video', methods=['POST'])
 def upload_video():
-    """動画をアップロード"""
+    """動画をアップロード（multipart/form-data）"""
     try:
+        # ファイル部分は解析時に保存先へ直接書き込まれる（UploadRequest）
+        saved = take_multipart_upload('video')
+
         if 'video' not in request.files:
             return jsonify({'error': 'No video file provided'}), 400
 
-        file = request.files['video']
-
-        if not file.filename:
+        if saved is None:
             return jsonify({'error': 'No file selected'}), 400
 
-        user_id = get_or_create_session_id()
-        upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], user_id, 'videos')
-        os.makedirs(upload_dir, exist_ok=True)
-
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        file_path = os.path.join(upload_dir, filename)
-
-        file.save(file_path)
+        file_path, filename = saved
 
         logger.info(f"Video uploaded: {file_path}")
 
@@ -293,16 +585,87 @@ def upload_video():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/upload/video/stream', methods=['POST'])
+def upload_video_stream():
+    """動画をアップロード（生ボディのストリーミング）"""
+    try:
+        return handle_stream_upload('videos')
+    except Exception as e:
+        logger.error(f"Error streaming video upload: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/upload/video/presign', methods=['POST'])
+def presign_video_upload():
+    """
+    動画をSupabase Storageへ直接アップロードするための署名付きURLを発行
+
+    クライアントは返された upload_url にファイルをPUTし、
+    video_path をそのまま /api/tasks の params.video_path に渡す。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        filename = secure_filename(data.get('filename', ''))
+
+        if not filename:
+            return jsonify({'error': 'filename is required'}), 400
+
+        if get_supabase_client().mock_mode:
+            return jsonify({'error': 'Direct upload is not available (Supabase not configured)'}), 503
+
+        user_id = get_or_create_session_id()
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        storage_path = f"{user_id}/videos/{timestamp}_{filename}"
+
+        signed = get_supabase_client().create_signed_upload_url(storage_path)
+
+        return jsonify({
+            'upload_url': signed['signed_url'],
+            'token': signed['token'],
+            'storage_path': storage_path,
+            'video_path': f"{STORAGE_URI_PREFIX}{STORAGE_BUCKET}/{storage_path}"
+        })
+
+    except Exception as e:
+        logger.error(f"Error creating signed upload URL: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
 # ============================================================================
 # ファイル提供
 # ============================================================================
 
+def send_file_from(directory: str, filename: str, internal_location: str):
+    """
+    ディレクトリ内のファイルを返す
+
+    X_ACCEL_REDIRECT_PREFIX が設定されている場合はX-Accel-Redirectヘッダーのみを返し、
+    実際の転送はnginx（sendfile）に任せる。未設定の場合はFlaskから直接返す。
+
+    Args:
+        directory: 公開ディレクトリの絶対パス
+        filename: ディレクトリからの相対パス
+        internal_location: nginx側のinternal location名（outputs / uploads）
+    """
+    if not X_ACCEL_REDIRECT_PREFIX:
+        return send_from_directory(directory, filename, max_age=FILE_CACHE_MAX_AGE)
+
+    file_path = safe_join(directory, filename)
+    if file_path is None or not os.path.isfile(file_path):
+        raise NotFound()
+
+    response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    response.headers['X-Accel-Redirect'] = f"{X_ACCEL_REDIRECT_PREFIX}/{internal_location}/{quote(filename)}"
+    response.cache_control.public = True
+    response.cache_control.max_age = FILE_CACHE_MAX_AGE
+    return response
+
+
 @app.route('/outputs/<path:filename>')
 def serve_output_file(filename):
     """出力ファイルを提供"""
     try:
-        output_dir = os.path.abspath(app.config['OUTPUT_FOLDER'])
-        return send_from_directory(output_dir, filename)
+        return send_file_from(OUTPUT_FOLDER_ABS, filename, 'outputs')
     except Exception as e:
         logger.error(f"Error serving file: {e}", exc_info=True)
         return jsonify({'error': 'File not found'}), 404
@@ -312,8 +675,7 @@ def serve_output_file(filename):
 def serve_upload_file(filename):
     """アップロードファイルを提供"""
     try:
-        upload_dir = os.path.abspath(app.config['UPLOAD_FOLDER'])
-        return send_from_directory(upload_dir, filename)
+        return send_file_from(UPLOAD_FOLDER_ABS, filename, 'uploads')
     except Exception as e:
         logger.error(f"Error serving file: {e}", exc_info=True)
         return jsonify({'error': 'File not found'}), 404
@@ -338,14 +700,15 @@ def health():
     return jsonify({
         'status': 'healthy',
         'celery_connected': True,
-        'supabase_connected': not supabase_client.mock_mode
+        'supabase_connected': get_supabase_client().ping(),
+        'supabase': get_supabase_client().get_stats()
     })
 
 
 if __name__ == '__main__':
     logger.info("Starting Flask application with async support...")
-    logger.info(f"Uploads: {app.config['UPLOAD_FOLDER']}")
-    logger.info(f"Outputs: {app.config['OUTPUT_FOLDER']}")
+    logger.info(f"Uploads: {UPLOAD_FOLDER}")
+    logger.info(f"Outputs: {OUTPUT_FOLDER}")
 
     app.run(
         host='0.0.0.0',
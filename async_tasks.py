@@ -2,21 +2,112 @@
 Celery Async Tasks with Supabase Integration
 非同期タスクの定義
 """
-from celery import Task
+from celery import Task, chord, group
+from celery.result import GroupResult
+from celery.signals import worker_init, worker_process_shutdown, worker_shutdown
 from celery_app import get_celery_app
-from supabase_client import supabase_client
+from supabase_client import get_supabase_client, now_iso, STORAGE_BUCKET, STORAGE_URI_PREFIX
+from task_cache import task_cache
 from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+from werkzeug.utils import secure_filename
+import gc
+import hashlib
+import importlib
 import logging
 import os
+import threading
 import time
 
 logger = logging.getLogger(__name__)
 celery_app = get_celery_app()
 
+# 環境変数はインポート時に1回だけ読み込む（.env は celery_app で読み込み済み）
+GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
+UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
+
+# 進捗をCeleryの結果バックエンド（Redis）にも書き込むか（Flowerなどで確認する場合のみ有効化）
+# アプリは進捗をSupabaseから読むため、既定では書き込まない
+EMIT_CELERY_STATE = os.getenv('EMIT_CELERY_STATE', '0') == '1'
+
+# Supabaseへの進捗書き込みの間引き設定
+PROGRESS_WRITE_INTERVAL = 2.0   # 前回の書き込みからの最小間隔（秒）
+PROGRESS_WRITE_MIN_DELTA = 10   # この差分（%）以上進んだら間隔に関係なく書き込む
+
+
+class _ProgressBuffer:
+    """
+    タスクごとの進捗を溜め、Supabaseへ書き込むタイミングを決める
+
+    前回の書き込みから PROGRESS_WRITE_INTERVAL 秒経過したか、PROGRESS_WRITE_MIN_DELTA % 以上進んだか、
+    開始（0%）・完了（100%）の場合のみ書き込み対象の更新を返す。
+    geventプールでは同じタスクが並行実行されるため、DBタスクIDごとにロック下で保持する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # db_task_id -> (未書き込みの更新, 最終書き込み時刻, 最終書き込み時の進捗)
+        self._entries = {}
+
+    def start(self, db_task_id: str):
+        """タスク開始時に状態を初期化"""
+        with self._lock:
+            self._entries[db_task_id] = ({}, time.monotonic(), 0)
+
+    def add(self, db_task_id: str, progress: int, current_step: str = None) -> Optional[dict]:
+        """
+        進捗を追加
+
+        Args:
+            db_task_id: データベースタスクID
+            progress: 進捗率（0-100）
+            current_step: 現在のステップ説明
+
+        Returns:
+            書き込むべき更新データ（まだ書き込まない場合はNone）
+        """
+        now = time.monotonic()
+        with self._lock:
+            pending, last_write_ts, last_progress = self._entries.get(db_task_id, ({}, 0.0, 0))
+            pending['progress'] = progress
+            if current_step:
+                pending['current_step'] = current_step
+
+            if (progress in (0, 100)
+                    or now - last_write_ts >= PROGRESS_WRITE_INTERVAL
+                    or abs(progress - last_progress) >= PROGRESS_WRITE_MIN_DELTA):
+                self._entries[db_task_id] = ({}, now, progress)
+                return pending
+
+            self._entries[db_task_id] = (pending, last_write_ts, last_progress)
+            return None
+
+    def pop(self, db_task_id: str) -> dict:
+        """未書き込みの更新を取り出し、状態を破棄"""
+        with self._lock:
+            entry = self._entries.pop(db_task_id, None)
+        return entry[0] if entry else {}
+
+
+_progress_buffer = _ProgressBuffer()
+
 
 class BaseVideoTask(Task):
     """ビデオ処理タスクの基底クラス（Supabase統合）"""
 
+    def before_start(self, task_id, args, kwargs):
+        """タスク開始前の処理"""
+        db_task_id = kwargs.get('db_task_id') or (args[0] if args else None)
+        if db_task_id:
+            _progress_buffer.start(db_task_id)
+
+    def _pop_pending_progress(self, db_task_id: str) -> dict:
+        """未書き込みの進捗（間引き中・送信待ち）を取り出し、状態を破棄"""
+        update_data = get_supabase_client().take_pending_update(db_task_id)
+        update_data.update(_progress_buffer.pop(db_task_id))
+        return update_data
+
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         """タスク失敗時の処理"""
         logger.error(f"Task {task_id} failed: {exc}", exc_info=True)
@@ -25,59 +116,270 @@ class BaseVideoTask(Task):
         db_task_id = kwargs.get('db_task_id') or (args[0] if args else None)
         if db_task_id:
             try:
-                supabase_client.update_task(db_task_id, {
+                update_data = self._pop_pending_progress(db_task_id)
+                update_data.update({
                     'status': 'failed',
                     'error_message': str(exc),
                     'error_type': type(exc).__name__,
-                    'completed_at': datetime.utcnow().isoformat()
+                    'completed_at': now_iso()
                 })
+                get_supabase_client().update_task_minimal(db_task_id, update_data)
             except Exception as e:
                 logger.error(f"Failed to update task status in Supabase: {e}")
+            task_cache.invalidate_task(db_task_id)
 
     def on_success(self, retval, task_id, args, kwargs):
         """タスク成功時の処理"""
         logger.info(f"Task {task_id} succeeded")
 
+        # タスク本体の complete() で書き込み済み
+        if getattr(self.request, 'completed_in_body', False):
+            return
+
         db_task_id = kwargs.get('db_task_id') or (args[0] if args else None)
         if db_task_id:
             try:
-                supabase_client.update_task(db_task_id, {
+                update_data = self._pop_pending_progress(db_task_id)
+                update_data.update({
                     'status': 'success',
                     'progress': 100,
-                    'completed_at': datetime.utcnow().isoformat()
+                    'completed_at': now_iso()
                 })
+                get_supabase_client().update_task_minimal(db_task_id, update_data)
             except Exception as e:
                 logger.error(f"Failed to update task status in Supabase: {e}")
+            task_cache.invalidate_task(db_task_id)
+
+    def complete(self, db_task_id: str, result_data: dict):
+        """
+        結果と成功ステータスを1回の書き込みで保存
+
+        on_success での書き込みは省略されるため、完了時のPATCHは1回で済む。
+
+        Args:
+            db_task_id: データベースタスクID
+            result_data: 結果データ（result_path, result_url, result_metadata など）
+        """
+        update_data = self._pop_pending_progress(db_task_id)
+        update_data.update(result_data)
+        update_data.update({
+            'status': 'success',
+            'progress': 100,
+            'current_step': '完了',
+            'completed_at': now_iso()
+        })
+        get_supabase_client().update_task_minimal(db_task_id, update_data)
+        task_cache.invalidate_task(db_task_id)
+        self.request.completed_in_body = True
 
     def update_progress(self, db_task_id: str, progress: int, current_step: str = None):
         """
         進捗を更新
 
+        Supabaseへの書き込みは _ProgressBuffer で間引く。
+        書き込まなかった更新は次回の書き込みか終了時（complete / on_success / on_failure）にまとめて反映する。
+        書き込みはバックグラウンドスレッドで行い、タスク本体はSupabaseの応答を待たない。
+
         Args:
             db_task_id: データベースタスクID
             progress: 進捗率（0-100）
             current_step: 現在のステップ説明
         """
         # Celeryの状態を更新
-        self.update_state(
-            state='PROGRESS',
-            meta={
-                'progress': progress,
-                'current_step': current_step,
-                'timestamp': datetime.utcnow().isoformat()
-            }
-        )
+        if EMIT_CELERY_STATE:
+            self.update_state(
+                state='PROGRESS',
+                meta={
+                    'progress': progress,
+                    'current_step': current_step,
+                    'timestamp': time.time()
+                }
+            )
 
         # Supabaseを更新
         if db_task_id:
-            try:
-                update_data = {'progress': progress}
-                if current_step:
-                    update_data['current_step'] = current_step
+            self._write_progress(db_task_id, progress, current_step)
+
+    def _write_progress(self, db_task_id: str, progress: int, current_step: str = None):
+        """Supabaseへの進捗書き込み（間引き・バックグラウンド送信）"""
+        update_data = _progress_buffer.add(db_task_id, progress, current_step)
+        if update_data:
+            get_supabase_client().update_task_async(db_task_id, update_data)
+            # 書き込み前に読まれた古い値もキャッシュのTTL（1秒）で入れ替わる
+            task_cache.invalidate_task(db_task_id)
+
+
+# ============================================================================
+# 生成クライアント（ワーカープロセスごとに1つを使い回す）
+# ============================================================================
+
+# 終了時に閉じるVeoクライアント
+_veo_clients = []
+
+
+@lru_cache(maxsize=1)
+def get_veo_generator(api_key: str):
+    """VeoVideoGeneratorを取得（APIクライアントとTLSセッションを再利用）"""
+    from veo_generator import VeoVideoGenerator
+    veo = VeoVideoGenerator(api_key)
+    _veo_clients.append(veo.client)
+    return veo
+
 
-                supabase_client.update_task(db_task_id, update_data)
+@lru_cache(maxsize=1)
+def get_video_composer():
+    """VideoComposerを取得（FFmpegの存在確認を1回で済ませる）"""
+    from video_composer import VideoComposer
+    return VideoComposer()
+
+
+@lru_cache(maxsize=1)
+def get_ai_frame_editor(api_key: str):
+    """AIFrameEditorを取得"""
+    from frame_editor import AIFrameEditor
+    return AIFrameEditor(api_key)
+
+
+@worker_init.connect
+def check_worker_config(**kwargs):
+    """ワーカー起動時に設定を確認（タスク実行時まで気づかないのを防ぐ）"""
+    if not GOOGLE_API_KEY:
+        logger.error("GOOGLE_API_KEY is not set. Veo generation tasks will fail.")
+
+
+# タスク内で遅延インポートしている重いモジュール（Flask側では読み込まない）
+TASK_MODULES = ('veo_generator', 'video_composer', 'frame_editor', 'generate_property_video')
+
+
+@worker_init.connect
+def preload_task_modules(**kwargs):
+    """
+    ワーカー起動時にタスク用モジュールを読み込む
+
+    preforkでは親プロセスで読み込んだモジュールを子プロセスが引き継ぐため、
+    子プロセスが入れ替わるたびに最初のタスクがインポート時間を負担しなくて済む。
+    """
+    for name in TASK_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"Failed to preload {name}: {e}")
+
+
+@worker_process_shutdown.connect  # preforkの子プロセス（atexitが実行されない場合がある）
+@worker_shutdown.connect          # gevent / solo（タスクはメインプロセスで実行）
+def flush_progress_updates(**kwargs):
+    """ワーカー終了時に未送信の進捗をSupabaseへ書き込む"""
+    client = get_supabase_client(create=False)
+    if client is not None:
+        client.flush_async_updates()
+
+
+@worker_process_shutdown.connect  # preforkの子プロセス
+@worker_shutdown.connect          # gevent / solo（タスクはメインプロセスで実行）
+def close_generators(**kwargs):
+    """ワーカー終了時にVeoクライアントのHTTPセッションを閉じる"""
+    while _veo_clients:
+        close = getattr(_veo_clients.pop(), 'close', None)
+        if callable(close):
+            try:
+                close()
             except Exception as e:
-                logger.error(f"Failed to update progress in Supabase: {e}")
+                logger.warning(f"Failed to close Veo client: {e}")
+    get_veo_generator.cache_clear()
+    get_ai_frame_editor.cache_clear()
+    get_video_composer.cache_clear()
+
+
+@lru_cache(maxsize=128)
+def ensure_dir(path: str):
+    """
+    ディレクトリを作成（このプロセスで確認済みなら何もしない）
+
+    ユーザーごとのディレクトリが増え続けても記録する数は上限までに抑える。
+    """
+    os.makedirs(path, exist_ok=True)
+
+
+def get_file_size(path: str) -> int:
+    """ファイルサイズを取得（取得できない場合は0）"""
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
+
+
+# ハッシュ計算時の読み込み単位（1MB）
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_sha256(path: str) -> str:
+    """ファイル全体を読み込まずにSHA-256を計算"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def veo_cache_key(image_path: str, prompt: str, duration: int) -> str:
+    """
+    Veo生成の入力（画像の内容・プロンプト・長さ）から再利用判定用のキーを生成
+
+    Args:
+        image_path: 入力画像のパス
+        prompt: 動画生成プロンプト
+        duration: 動画の長さ（秒）
+
+    Returns:
+        キャッシュキー
+    """
+    # ストリーミングアップロード時に記録したハッシュがあれば画像を読み直さない
+    # アップロード時の記録はサイズが現在のファイルと一致する場合のみ使う（上書きされた古い記録を避ける）
+    image_hash = (
+        get_supabase_client().get_file_hash(image_path, file_size=get_file_size(image_path))
+        or file_sha256(image_path)
+    )
+    prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+    return f"{image_hash}:{prompt_hash}:{duration}"
+
+
+def resolve_input_path(path: str, user_id: str = None) -> str:
+    """
+    入力ファイルのパスをローカルパスに解決
+
+    Storageに直接アップロードされたファイル（storage://<bucket>/<path>）は
+    ワーカーのアップロードディレクトリへダウンロードする。
+    ダウンロードはサービスロールで行われバケットのポリシーが効かないため、
+    presign が発行したそのユーザーのパス（<user_id>/...）以外は拒否する。
+
+    Args:
+        path: ローカルパスまたはStorage URI
+        user_id: ユーザーID
+
+    Returns:
+        ローカルパス
+
+    Raises:
+        ValueError: Storage URIが不正、または他のユーザーのファイルを指している場合
+    """
+    if not path.startswith(STORAGE_URI_PREFIX):
+        return path
+
+    bucket, _, storage_path = path[len(STORAGE_URI_PREFIX):].partition('/')
+    if bucket != STORAGE_BUCKET or not storage_path:
+        raise ValueError(f"Invalid storage URI: {path}")
+    if not user_id or not storage_path.startswith(f"{user_id}/") or '..' in storage_path.split('/'):
+        raise ValueError(f"Storage path does not belong to the user: {path}")
+
+    local_dir = os.path.join(UPLOAD_FOLDER, user_id, 'videos')
+    ensure_dir(local_dir)
+    local_path = os.path.join(local_dir, os.path.basename(storage_path))
+
+    if not os.path.exists(local_path):
+        get_supabase_client().download_file(storage_path, local_path)
+
+    return local_path
 
 
 # Paid Veo API call: retries disabled to avoid double-billing on failures.
@@ -85,6 +387,7 @@ class BaseVideoTask(Task):
     bind=True,
     base=BaseVideoTask,
     name='async_tasks.veo_generate_task',
+    ignore_result=True,  # 結果はSupabaseに保存済み
     max_retries=0,
     soft_time_limit=900,
     time_limit=1200,
@@ -101,32 +404,50 @@ def veo_generate_task(self, db_task_id: str, image_path: str, prompt: str,
         duration: 動画の長さ（秒）
         user_id: ユーザーID
     """
-    from veo_generator import VeoVideoGenerator
-
     logger.info(f"Starting Veo generation: {db_task_id}")
 
+    cache_key = veo_cache_key(image_path, prompt, duration)
+
     # タスク開始
-    supabase_client.update_task(db_task_id, {
+    get_supabase_client().update_task_minimal(db_task_id, {
         'status': 'running',
-        'started_at': datetime.utcnow().isoformat()
+        'started_at': now_iso(),
+        'cache_key': cache_key
     })
 
     try:
-        api_key = os.getenv("GOOGLE_API_KEY")
+        # 同じ画像・プロンプトで生成済みなら、有料APIを呼ばずに結果を再利用
+        prior = get_supabase_client().get_completed_task_by_key(cache_key)
+        if prior and prior.get('result_path') and os.path.exists(prior['result_path']):
+            logger.info(f"Reusing Veo result of task {prior['id']}: {prior['result_path']}")
+
+            self.complete(db_task_id, {
+                'result_path': prior['result_path'],
+                'result_url': prior['result_url'],
+                'result_metadata': {
+                    **(prior.get('result_metadata') or {}),
+                    'reused_from_task': prior['id']
+                }
+            })
+
+            return {'video_path': prior['result_path'], 'reused': True}
+
+        api_key = GOOGLE_API_KEY
         if not api_key:
             raise ValueError("GOOGLE_API_KEY is not set")
 
-        veo = VeoVideoGenerator(api_key)
+        veo = get_veo_generator(api_key)
 
         # 進捗更新
         self.update_progress(db_task_id, 10, "画像をアップロード中...")
 
         # 出力ディレクトリ
         output_dir = os.path.join('outputs', 'veo_videos', user_id or 'anonymous')
-        os.makedirs(output_dir, exist_ok=True)
+        ensure_dir(output_dir)
 
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_path = os.path.join(output_dir, f'veo_{timestamp}.mp4')
+        # ナノ秒の時刻で一意にする（同じユーザーの同時実行でも秒単位の名前が衝突しない）
+        stamp = format(time.time_ns(), 'x')
+        output_path = os.path.join(output_dir, f'veo_{stamp}.mp4')
 
         # 進捗更新
         self.update_progress(db_task_id, 20, "動画生成中... (これには数分かかります)")
@@ -142,9 +463,9 @@ def veo_generate_task(self, db_task_id: str, image_path: str, prompt: str,
         # 結果を保存
         self.update_progress(db_task_id, 95, "結果を保存中...")
 
-        file_size = os.path.getsize(video_path) if os.path.exists(video_path) else 0
+        file_size = get_file_size(video_path)
 
-        supabase_client.update_task(db_task_id, {
+        self.complete(db_task_id, {
             'result_path': video_path,
             'result_url': f"/outputs/{os.path.relpath(video_path, 'outputs')}",
             'result_metadata': {
@@ -154,8 +475,6 @@ def veo_generate_task(self, db_task_id: str, image_path: str, prompt: str,
                 'file_size': file_size
             }
         })
-
-        self.update_progress(db_task_id, 100, "完了")
         logger.info(f"Veo generation completed: {video_path}")
 
         return {'video_path': video_path}
@@ -171,6 +490,7 @@ def veo_generate_task(self, db_task_id: str, image_path: str, prompt: str,
     bind=True,
     base=BaseVideoTask,
     name='async_tasks.property_video_generation_task',
+    ignore_result=True,  # 結果はSupabaseに保存済み
     max_retries=0,
     soft_time_limit=1800,  # 30 minutes (generates 3 videos)
     time_limit=2400,       # 40 minutes hard limit
@@ -196,13 +516,13 @@ def property_video_generation_task(self, db_task_id: str, session_id: str,
     logger.warning(f"⚠️  Images to process: {image_paths}")
 
     # タスク開始
-    supabase_client.update_task(db_task_id, {
+    get_supabase_client().update_task_minimal(db_task_id, {
         'status': 'running',
-        'started_at': datetime.utcnow().isoformat()
+        'started_at': now_iso()
     })
 
     try:
-        api_key = os.getenv("GOOGLE_API_KEY")
+        api_key = GOOGLE_API_KEY
         if not api_key:
             raise ValueError("GOOGLE_API_KEY is not set")
 
@@ -216,21 +536,29 @@ def property_video_generation_task(self, db_task_id: str, session_id: str,
         generator = PropertyVideoGenerator(
             api_key=api_key,
             output_dir=output_dir,
-            session_name=session_id
+            session_name=session_id,
+            veo_generator=get_veo_generator(api_key),
+            video_composer=get_video_composer()
         )
 
         logger.info(f"Session directory: {generator.session_dir}")
 
         # 進捗更新: Generating clips
-        self.update_progress(db_task_id, 50,
-                           f"{len(image_paths)}個の動画クリップを生成中... (これには15-20分かかります)")
+        self.update_progress(db_task_id, 20,
+                           f"{len(image_paths)}個の動画クリップを並列生成中... (これには5-10分かかります)")
 
         logger.warning(f"⚠️  Starting generation of {len(image_paths)} video clips (billable API calls)")
 
+        def on_clip_completed(completed: int, total: int):
+            # 20% → 80% をクリップの完了数に応じて進める
+            self.update_progress(db_task_id, 20 + 60 * completed // total,
+                               f"{completed}/{total} クリップ生成完了")
+
         # Step 1: Generate video clips from images
         video_clips = generator.generate_video_clips(
             image_paths=image_paths,
-            duration=8
+            duration=8,
+            progress_callback=on_clip_completed
         )
 
         logger.info(f"✓ Generated {len(video_clips)} video clips")
@@ -256,10 +584,10 @@ def property_video_generation_task(self, db_task_id: str, session_id: str,
         self.update_progress(db_task_id, 95, "結果を保存中...")
 
         # Get file size
-        file_size = os.path.getsize(final_video_path) if os.path.exists(final_video_path) else 0
+        file_size = get_file_size(final_video_path)
 
         # Save result metadata
-        supabase_client.update_task(db_task_id, {
+        self.complete(db_task_id, {
             'result_path': final_video_path,
             'result_url': f"/outputs/{os.path.relpath(final_video_path, 'outputs')}",
             'result_metadata': {
@@ -275,9 +603,6 @@ def property_video_generation_task(self, db_task_id: str, session_id: str,
             }
         })
 
-        # 進捗更新: Complete
-        self.update_progress(db_task_id, 100, "完了")
-
         logger.info(f"Property video generation completed: {final_video_path}")
         logger.warning(f"✓ Total billable API calls used: {num_api_calls}")
 
@@ -293,11 +618,262 @@ def property_video_generation_task(self, db_task_id: str, session_id: str,
         # Raise immediately so the caller can handle the failure without issuing more paid Veo calls.
         raise
 
+    finally:
+        # 動画クリップ関連のオブジェクトをワーカーに残さない（geventワーカーは子プロセスを再起動できない）
+        gc.collect()
+
+
+# ============================================================================
+# 物件動画ワークフロー（クリップ生成を並列のchordに分割）
+# ============================================================================
+
+class PropertyClipTask(BaseVideoTask):
+    """
+    物件動画ワークフローの各クリップ生成タスク
+
+    親タスク（db_task_id）の完了は compose_final_video_task が書き込むため、
+    成功時は完了したクリップ数に応じて進捗のみ更新する。
+    失敗時は BaseVideoTask と同様に親タスクを失敗にし（chordの後続は実行されない）、
+    結果が使われなくなる兄弟クリップの有料API呼び出しを止める。
+    """
+
+    def before_start(self, task_id, args, kwargs):
+        """進捗の書き込み状態は兄弟タスクと共有するため初期化しない"""
+
+    def on_success(self, retval, task_id, args, kwargs):
+        """完了したクリップ数から親タスクの進捗を更新"""
+        logger.info(f"Clip task {task_id} succeeded: {retval}")
+
+        db_task_id = kwargs.get('db_task_id')
+        clip_count = kwargs.get('clip_count') or 1
+        completed = 1
+
+        if self.request.group:
+            try:
+                # 結果は on_success より前に保存されるため、このクリップも数に含まれる
+                completed = GroupResult.restore(self.request.group, app=self.app).completed_count()
+            except Exception as e:
+                logger.warning(f"Failed to count completed clips: {e}")
+
+        # update_state を呼ぶと保存済みのSUCCESSを上書きしてしまうため、Supabaseのみ更新。
+        # 親タスクの完了はこのプロセスでは書き込まれないため、_ProgressBuffer には登録しない
+        # （1クリップで20%以上進むので間引きも不要）
+        get_supabase_client().update_task_async(db_task_id, {
+            'progress': 20 + 60 * completed // clip_count,
+            'current_step': f"{completed}/{clip_count} クリップ生成完了"
+        })
+        task_cache.invalidate_task(db_task_id)
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        """親タスクを失敗にし、実行中・待機中の兄弟クリップを取り消す"""
+        super().on_failure(exc, task_id, args, kwargs, einfo)
+
+        clip_count = kwargs.get('clip_count') or 1
+        # クリップのIDは property_clip_task_ids で「<ワークフローのID>-clip-<番号>」として採番されている
+        workflow_task_id = task_id.rsplit('-clip-', 1)[0]
+        siblings = [
+            clip_task_id for clip_task_id in property_clip_task_ids(workflow_task_id, clip_count)
+            if clip_task_id != task_id
+        ]
+        if siblings:
+            try:
+                self.app.control.revoke(siblings, terminate=True)
+                logger.info(f"Revoked {len(siblings)} sibling clip tasks of {workflow_task_id}")
+            except Exception as e:
+                logger.error(f"Failed to revoke sibling clip tasks: {e}")
+
+
+def property_clip_task_ids(celery_task_id: str, clip_count: int) -> list:
+    """ワークフローの各クリップタスクのCeleryタスクID（キャンセル時に使用）"""
+    return [f"{celery_task_id}-clip-{i + 1}" for i in range(clip_count)]
+
+
+# Paid Veo API call: retries disabled to avoid double-billing on failures.
+@celery_app.task(
+    bind=True,
+    base=PropertyClipTask,
+    name='async_tasks.property_clip_task',
+    max_retries=0,
+    soft_time_limit=900,
+    time_limit=1200,
+)
+def property_clip_task(self, db_task_id: str, clip_index: int, clip_count: int,
+                       image_path: str, output_path: str, prompt: str = None,
+                       duration: int = 8):
+    """
+    物件動画のクリップを1本生成
+
+    Args:
+        db_task_id: 親のデータベースタスクID
+        clip_index: クリップ番号（0始まり）
+        clip_count: ワークフロー全体のクリップ数
+        image_path: 入力画像のパス
+        output_path: クリップの出力パス
+        prompt: 動画生成プロンプト（省略時は既定のプロンプト）
+        duration: クリップの長さ（秒）
+
+    Returns:
+        生成したクリップのパス
+    """
+    from generate_property_video import PropertyVideoGenerator
+
+    api_key = GOOGLE_API_KEY
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY is not set")
+
+    # 最初に開始したクリップが親タスクを running にする（キューの順序に依存しない）
+    get_supabase_client().mark_task_started(db_task_id)
+
+    if prompt is None:
+        prompts = PropertyVideoGenerator.DEFAULT_PROMPTS
+        prompt = prompts[clip_index % len(prompts)]
+
+    ensure_dir(os.path.dirname(output_path))
+
+    logger.warning(f"⚠️  BILLABLE API CALL: clip {clip_index + 1}/{clip_count} for {db_task_id}")
+
+    return get_veo_generator(api_key).generate_from_image_file(
+        image_path=image_path,
+        prompt=prompt,
+        output_path=output_path,
+        duration=duration
+    )
+
+
+# Local FFmpeg composition: safe to retry.
+@celery_app.task(
+    bind=True,
+    base=BaseVideoTask,
+    name='async_tasks.compose_final_video_task',
+    ignore_result=True,  # 結果はSupabaseに保存済み
+    autoretry_for=(Exception,),
+    max_retries=2,
+    default_retry_delay=10,
+    soft_time_limit=300,
+    time_limit=600,
+)
+def compose_final_video_task(self, video_clips: list, db_task_id: str, session_dir: str,
+                             output_name: str, image_paths: list,
+                             transition_type: str = "fade", transition_duration: float = 0.5):
+    """
+    生成済みクリップをトランジション付きで1本の動画に結合（chordの後続タスク）
+
+    Args:
+        video_clips: クリップのパスリスト（chordのヘッダーの結果）
+        db_task_id: データベースタスクID
+        session_dir: セッションディレクトリ
+        output_name: 出力ファイル名
+        image_paths: 入力画像のパスリスト（メタデータ用）
+        transition_type: トランジションの種類
+        transition_duration: トランジションの長さ（秒）
+    """
+    logger.info(f"Composing property video from {len(video_clips)} clips: {db_task_id}")
+
+    self.update_progress(db_task_id, 80, "最終動画を作成中...")
+
+    final_video_path = get_video_composer().compose_with_transitions(
+        video_paths=video_clips,
+        output_path=os.path.join(session_dir, output_name),
+        transition_type=transition_type,
+        transition_duration=transition_duration,
+        resolution="1280x720"
+    )
+
+    self.update_progress(db_task_id, 95, "結果を保存中...")
+
+    file_size = get_file_size(final_video_path)
+
+    self.complete(db_task_id, {
+        'result_path': final_video_path,
+        'result_url': f"/outputs/{os.path.relpath(final_video_path, 'outputs')}",
+        'result_metadata': {
+            'clips_generated': len(video_clips),
+            'api_calls_used': len(video_clips),
+            'input_images': image_paths,
+            'clips_dir': os.path.join(session_dir, 'clips'),
+            'session_dir': session_dir,
+            'file_size': file_size,
+            'transition_type': transition_type,
+            'transition_duration': transition_duration
+        }
+    })
+
+    logger.info(f"Property video generation completed: {final_video_path}")
+
+    # 結合処理で確保したメモリを次のタスクの前に解放
+    gc.collect()
+
+    return {'video_path': final_video_path, 'clips_generated': len(video_clips)}
+
+
+def start_property_video_workflow(db_task_id: str, task_id: str, image_paths: list,
+                                  session_id: str, user_id: str = None):
+    """
+    物件動画生成をchordとして投入
+
+    各クリップは独立したタスクとして並列に生成され、すべて完了すると
+    compose_final_video_task が結合する。長時間ワーカーを1つ占有し続けることがなく、
+    キャンセルやリトライもクリップ単位で扱える。
+
+    Args:
+        db_task_id: データベースタスクID
+        task_id: 結合タスクのCeleryタスクID（クリップのIDもここから生成）
+        image_paths: 入力画像のパスリスト
+        session_id: セッションID（出力ディレクトリ名）
+        user_id: ユーザーID
+
+    Returns:
+        結合タスクのAsyncResult
+    """
+    for name in (user_id, session_id):
+        # 相対パス（..）や絶対パスで outputs/ の外に書き込ませない
+        if name and secure_filename(name) != name:
+            raise ValueError(f"Invalid path component: {name!r}")
+
+    session_dir = os.path.join('outputs', 'property_videos', user_id or 'anonymous', session_id)
+    clips_dir = os.path.join(session_dir, 'clips')
+    clip_count = len(image_paths)
+    clip_task_ids = property_clip_task_ids(task_id, clip_count)
+
+    logger.warning(f"⚠️  BILLABLE API CALLS: This workflow will make {clip_count} paid Veo API calls")
+
+    header = group(
+        property_clip_task.signature(
+            kwargs={
+                'db_task_id': db_task_id,
+                'clip_index': i,
+                'clip_count': clip_count,
+                'image_path': image_path,
+                'output_path': os.path.join(clips_dir, f"clip_{i + 1:02d}.mp4")
+            },
+            task_id=clip_task_id
+        )
+        for i, (image_path, clip_task_id) in enumerate(zip(image_paths, clip_task_ids))
+    )
+
+    body = compose_final_video_task.signature(
+        kwargs={
+            'db_task_id': db_task_id,
+            'session_dir': session_dir,
+            'output_name': f"property_video_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4",
+            'image_paths': image_paths
+        },
+        task_id=task_id
+    )
+
+    result = chord(header)(body)
+
+    # クリップの完了数を数えられるようにグループの結果を保存
+    result.parent.save()
+
+    return result
+
 
 @celery_app.task(
     bind=True,
     base=BaseVideoTask,
     name='async_tasks.generate_video_from_image_task',
+    ignore_result=True,  # 結果はSupabaseに保存済み
     max_retries=2,
     default_retry_delay=30,
     soft_time_limit=60,
@@ -314,19 +890,17 @@ def generate_video_from_image_task(self, db_task_id: str, image_path: str,
         prompt: プロンプト
         user_id: ユーザーID
     """
-    from frame_editor import AIFrameEditor
-
     logger.info(f"Starting video generation from image: {db_task_id}")
 
     # タスク開始
-    supabase_client.update_task(db_task_id, {
+    get_supabase_client().update_task_minimal(db_task_id, {
         'status': 'running',
-        'started_at': datetime.utcnow().isoformat()
+        'started_at': now_iso()
     })
 
     try:
-        api_key = os.getenv("GOOGLE_API_KEY", "demo-key")
-        ai_editor = AIFrameEditor(api_key)
+        api_key = GOOGLE_API_KEY or "demo-key"
+        ai_editor = get_ai_frame_editor(api_key)
 
         # 進捗更新
         self.update_progress(db_task_id, 10, "動画生成準備中...")
@@ -343,7 +917,7 @@ def generate_video_from_image_task(self, db_task_id: str, image_path: str,
         self.update_progress(db_task_id, 90, "結果を保存中...")
 
         # 結果を保存
-        supabase_client.update_task(db_task_id, {
+        self.complete(db_task_id, {
             'result_path': demo_video_path,
             'result_url': f"/{demo_video_path}",
             'result_metadata': {
@@ -352,8 +926,6 @@ def generate_video_from_image_task(self, db_task_id: str, image_path: str,
                 'demo_mode': True
             }
         })
-
-        self.update_progress(db_task_id, 100, "完了")
         logger.info(f"Video generation completed: {demo_video_path}")
 
         return {'video_path': demo_video_path}
@@ -367,6 +939,7 @@ def generate_video_from_image_task(self, db_task_id: str, image_path: str,
     bind=True,
     base=BaseVideoTask,
     name='async_tasks.extract_frames_task',
+    ignore_result=True,  # 結果はSupabaseに保存済み
     max_retries=2,
     soft_time_limit=120,
     time_limit=180,
@@ -387,15 +960,17 @@ def extract_frames_task(self, db_task_id: str, video_path: str,
     logger.info(f"Starting frame extraction: {db_task_id}")
 
     # タスク開始
-    supabase_client.update_task(db_task_id, {
+    get_supabase_client().update_task_minimal(db_task_id, {
         'status': 'running',
-        'started_at': datetime.utcnow().isoformat()
+        'started_at': now_iso()
     })
 
     try:
         # 進捗更新
         self.update_progress(db_task_id, 10, "動画を解析中...")
 
+        video_path = resolve_input_path(video_path, user_id)
+
         session_id = user_id or 'default'
         frames_dir = os.path.join('frames', session_id, 'editor')
 
@@ -408,28 +983,28 @@ def extract_frames_task(self, db_task_id: str, video_path: str,
         self.update_progress(db_task_id, 90, "結果を保存中...")
 
         # 結果を保存（base64データは除外）
-        frames_info = [
-            {
-                "frame_id": frame['frame_id'],
-                "path": frame['path'],
-                "timestamp": frame['timestamp'],
-                "seconds": frame['seconds']
-            }
-            for frame in frames
-        ]
+        # フレームごとのdictではなく項目ごとの配列にして、jsonbに同じキーが繰り返し入らないようにする
+        frame_ids, paths, timestamps, seconds = (
+            map(list, zip(*((f['frame_id'], f['path'], f['timestamp'], f['seconds']) for f in frames)))
+            if frames else ([], [], [], [])
+        )
 
-        supabase_client.update_task(db_task_id, {
+        self.complete(db_task_id, {
             'result_metadata': {
                 'frames_dir': frames_dir,
                 'frame_count': len(frames),
-                'frames': frames_info
+                'frames_soa': {
+                    'frame_ids': frame_ids,
+                    'paths': paths,
+                    'timestamps': timestamps,
+                    'seconds': seconds
+                }
             }
         })
-
-        self.update_progress(db_task_id, 100, "完了")
         logger.info(f"Frame extraction completed: {len(frames)} frames")
 
-        return {'frames': frames, 'frames_dir': frames_dir}
+        # フレームの一覧（base64を含む）はSupabaseに保存済みのため、結果バックエンドには載せない
+        return {'frames_dir': frames_dir, 'count': len(frames)}
 
     except Exception as exc:
         logger.error(f"Task failed: {exc}", exc_info=True)
@@ -35,9 +35,12 @@ def make_celery(app_name='video_tasks'):
     # Celery設定
     celery_app.conf.update(
         # タスク設定
-        task_serializer='json',
-        accept_content=['json'],
-        result_serializer='json',
+        task_serializer='msgpack',
+        accept_content=['msgpack'],
+        result_serializer='msgpack',
+        task_compression='zstd',
+        result_compression='zstd',
+        result_extended=False,  # 結果にタスクの引数などを保存しない
         timezone='Asia/Tokyo',
         enable_utc=True,
 
@@ -50,8 +53,8 @@ def make_celery(app_name='video_tasks'):
         task_reject_on_worker_lost=True,
 
         # ワーカー設定
-        worker_prefetch_multiplier=1,  # 一度に1つのタスクのみ取得
-        worker_max_tasks_per_child=10,  # メモリリーク防止
+        worker_prefetch_multiplier=1,  # 一度に1つのタスクのみ取得（-Ofairと併用）
+        # 子プロセスの入れ替え頻度はキューごとにワーカーの起動オプションで指定する（README参照）
 
         # 結果の有効期限
         result_expires=86400,  # 24時間
@@ -59,6 +62,9 @@ def make_celery(app_name='video_tasks'):
         # タスクルーティング（優先度別キュー）
         task_routes={
             'async_tasks.veo_generate_task': {'queue': 'veo_queue'},
+            'async_tasks.property_video_generation_task': {'queue': 'veo_queue'},
+            'async_tasks.property_clip_task': {'queue': 'veo_queue'},
+            'async_tasks.compose_final_video_task': {'queue': 'video_queue'},
             'async_tasks.generate_video_from_image_task': {'queue': 'video_queue'},
             'async_tasks.extract_frames_task': {'queue': 'default'},
         },
@@ -6,10 +6,12 @@ Complete automation workflow using Google Veo and FFmpeg
 import argparse
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 import logging
-from typing import List, Optional
+from typing import Callable, List, Optional
 from tqdm import tqdm
 
 from veo_generator import VeoVideoGenerator
@@ -23,6 +25,10 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class ClipGenerationStopped(Exception):
+    """Raised inside a clip worker after another clip has failed"""
+
+
 class PropertyVideoGenerator:
     """
     Manages the complete workflow for generating luxury property videos
@@ -50,7 +56,9 @@ class PropertyVideoGenerator:
         self,
         api_key: str,
         output_dir: str = "output",
-        session_name: Optional[str] = None
+        session_name: Optional[str] = None,
+        veo_generator: Optional[VeoVideoGenerator] = None,
+        video_composer: Optional[VideoComposer] = None
     ):
         """
         Initialize the Property Video Generator
@@ -59,10 +67,12 @@ class PropertyVideoGenerator:
             api_key: Google AI API key
             output_dir: Base output directory
             session_name: Optional session name (defaults to timestamp)
+            veo_generator: Optional shared Veo generator (created from api_key if omitted)
+            video_composer: Optional shared video composer (created if omitted)
         """
         self.api_key = api_key
-        self.veo_generator = VeoVideoGenerator(api_key)
-        self.video_composer = VideoComposer()
+        self.veo_generator = veo_generator or VeoVideoGenerator(api_key)
+        self.video_composer = video_composer or VideoComposer()
 
         # Create session directory
         if session_name is None:
@@ -76,22 +86,75 @@ class PropertyVideoGenerator:
 
         logger.info(f"Session directory: {self.session_dir}")
 
+    def _generate_single_clip(
+        self,
+        index: int,
+        total: int,
+        image_path: str,
+        prompt: str,
+        duration: int,
+        stop_event: Optional[threading.Event] = None
+    ) -> str:
+        """
+        Generate one video clip from an image
+
+        stop_event is checked before submitting the Veo request and again
+        before downloading the result. A Veo job that has already been
+        submitted cannot be cancelled (and is still billed), so setting the
+        event only skips work that has not started yet.
+
+        Args:
+            index: Zero-based clip index (used for the output file name)
+            total: Total number of clips being generated
+            image_path: Path to the input image
+            prompt: Prompt for this clip
+            duration: Duration of the clip in seconds
+            stop_event: Optional event set when the remaining clips are no longer needed
+
+        Returns:
+            Path to the generated video clip
+        """
+        clip_name = f"clip_{index+1:02d}.mp4"
+        output_path = self.clips_dir / clip_name
+
+        if stop_event is not None and stop_event.is_set():
+            raise ClipGenerationStopped(f"Clip {index+1} skipped before submission")
+
+        logger.info(f"Clip {index+1}/{total}: {Path(image_path).name} -> {clip_name}")
+
+        operation = self.veo_generator.generate_video(
+            image_path=image_path,
+            prompt=prompt,
+            duration=duration
+        )
+
+        if stop_event is not None and stop_event.is_set():
+            raise ClipGenerationStopped(f"Clip {index+1} generated but not downloaded")
+
+        return self.veo_generator.download_video(operation, str(output_path))
+
     def generate_video_clips(
         self,
         image_paths: List[str],
         prompts: Optional[List[str]] = None,
-        duration: int = 8
+        duration: int = 8,
+        progress_callback: Optional[Callable[[int, int], None]] = None
     ) -> List[str]:
         """
         Generate video clips from images using Google Veo
 
+        The clips are independent, so all Veo requests run in parallel
+        (each one is blocked on the API, not on CPU).
+
         Args:
             image_paths: List of paths to input images (3 images expected)
             prompts: Optional list of prompts (uses defaults if not provided)
             duration: Duration of each clip in seconds
+            progress_callback: Optional callback called as (completed, total)
+                each time a clip finishes
 
         Returns:
-            List of paths to generated video clips
+            List of paths to generated video clips (in the same order as image_paths)
         """
         if len(image_paths) != 3:
             raise ValueError("Exactly 3 images are required (exterior, interior, common areas)")
@@ -106,35 +169,40 @@ class PropertyVideoGenerator:
             if not os.path.exists(img_path):
                 raise FileNotFoundError(f"Image not found: {img_path}")
 
-        video_clips = []
-
-        # Generate each clip with progress bar
-        logger.info(f"Generating {len(image_paths)} video clips...")
-
-        with tqdm(total=len(image_paths), desc="Generating clips", unit="clip") as pbar:
-            for i, (image_path, prompt) in enumerate(zip(image_paths, prompts)):
-                clip_name = f"clip_{i+1:02d}.mp4"
-                output_path = self.clips_dir / clip_name
+        total = len(image_paths)
+        video_clips = [None] * total
 
-                logger.info(f"\n{'='*80}")
-                logger.info(f"Clip {i+1}/{len(image_paths)}: {Path(image_path).name}")
-                logger.info(f"{'='*80}")
+        logger.info(f"Generating {total} video clips in parallel...")
 
-                try:
-                    video_path = self.veo_generator.generate_from_image_file(
-                        image_path=image_path,
-                        prompt=prompt,
-                        output_path=str(output_path),
-                        duration=duration
-                    )
-                    video_clips.append(video_path)
-                    logger.info(f"✓ Clip {i+1} completed: {video_path}")
+        stop_event = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=total, thread_name_prefix="veo-clip")
+        futures = {
+            executor.submit(self._generate_single_clip, i, total, image_path, prompt, duration, stop_event): i
+            for i, (image_path, prompt) in enumerate(zip(image_paths, prompts))
+        }
 
-                except Exception as e:
-                    logger.error(f"✗ Failed to generate clip {i+1}: {e}")
-                    raise
-
-                pbar.update(1)
+        try:
+            with tqdm(total=total, desc="Generating clips", unit="clip") as pbar:
+                for completed, future in enumerate(as_completed(futures), start=1):
+                    i = futures[future]
+                    try:
+                        video_clips[i] = future.result()
+                    except Exception as e:
+                        logger.error(f"✗ Failed to generate clip {i+1}: {e}")
+                        raise
+
+                    logger.info(f"✓ Clip {i+1} completed: {video_clips[i]}")
+                    pbar.update(1)
+
+                    if progress_callback:
+                        progress_callback(completed, total)
+        finally:
+            # On failure (or a soft time limit), do not block on the remaining clips.
+            # Every clip starts immediately (max_workers=total), so there are no queued
+            # futures to cancel: the other workers keep waiting on their already-submitted
+            # Veo jobs, and the event only makes them skip the download when they return.
+            stop_event.set()
+            executor.shutdown(wait=False)
 
         logger.info(f"\nAll {len(video_clips)} clips generated successfully!")
         return video_clips
@@ -50,8 +50,10 @@ if command -v tmux &> /dev/null; then
     echo ""
     echo "   各ペインの役割:"
     echo "   - ペイン 0: Flask Webサーバー"
-    echo "   - ペイン 1: Celery Worker"
+    echo "   - ペイン 1: Celery Worker (prefork: フレーム抽出など)"
     echo "   - ペイン 2: Flower監視ダッシュボード"
+    echo "   - ペイン 3: Celery Worker (gevent: Veo生成)"
+    echo "   - ペイン 4: Celery Worker (prefork: 動画の結合)"
     echo ""
 
     # tmuxセッションを作成
@@ -65,7 +67,7 @@ if command -v tmux &> /dev/null; then
     tmux split-window -h -t ai-video-async:0
     tmux send-keys -t ai-video-async:0.1 'source venv/bin/activate 2>/dev/null || true' C-m
     tmux send-keys -t ai-video-async:0.1 'sleep 3' C-m
-    tmux send-keys -t ai-video-async:0.1 'celery -A async_tasks.celery_app worker --loglevel=info --concurrency=2' C-m
+    tmux send-keys -t ai-video-async:0.1 'celery -A async_tasks.celery_app worker -n default@%h -Q default -P prefork -c 8 -Ofair --max-tasks-per-child=100 --loglevel=info' C-m
 
     # ペイン2を作成: Flower
     tmux split-window -v -t ai-video-async:0.1
@@ -73,6 +75,18 @@ if command -v tmux &> /dev/null; then
     tmux send-keys -t ai-video-async:0.2 'sleep 5' C-m
     tmux send-keys -t ai-video-async:0.2 'celery -A async_tasks.celery_app flower --port=5555' C-m
 
+    # ペイン3を作成: Celery Worker (Veo)
+    tmux split-window -v -t ai-video-async:0.2
+    tmux send-keys -t ai-video-async:0.3 'source venv/bin/activate 2>/dev/null || true' C-m
+    tmux send-keys -t ai-video-async:0.3 'sleep 3' C-m
+    tmux send-keys -t ai-video-async:0.3 'celery -A async_tasks.celery_app worker -n veo@%h -Q veo_queue -P gevent -Ofair --loglevel=info --concurrency=100' C-m
+
+    # ペイン4を作成: Celery Worker (動画の結合)
+    tmux split-window -v -t ai-video-async:0.3
+    tmux send-keys -t ai-video-async:0.4 'source venv/bin/activate 2>/dev/null || true' C-m
+    tmux send-keys -t ai-video-async:0.4 'sleep 3' C-m
+    tmux send-keys -t ai-video-async:0.4 'celery -A async_tasks.celery_app worker -n video@%h -Q video_queue -P prefork -c 4 -Ofair --max-tasks-per-child=20 --max-memory-per-child=2000000 --loglevel=info' C-m
+
     # セッションにアタッチ
     echo "✅ 起動完了！"
     echo ""
@@ -95,10 +109,16 @@ else
     echo "ターミナル1 (Flask):"
     echo "  python app_async.py"
     echo ""
-    echo "ターミナル2 (Celery Worker):"
-    echo "  celery -A async_tasks.celery_app worker --loglevel=info --concurrency=2"
+    echo "ターミナル2 (Celery Worker - prefork/フレーム抽出など):"
+    echo "  celery -A async_tasks.celery_app worker -n default@%h -Q default -P prefork -c 8 -Ofair --max-tasks-per-child=100 --loglevel=info"
+    echo ""
+    echo "ターミナル3 (Celery Worker - prefork/動画の結合):"
+    echo "  celery -A async_tasks.celery_app worker -n video@%h -Q video_queue -P prefork -c 4 -Ofair --max-tasks-per-child=20 --max-memory-per-child=2000000 --loglevel=info"
+    echo ""
+    echo "ターミナル4 (Celery Worker - gevent/Veo):"
+    echo "  celery -A async_tasks.celery_app worker -n veo@%h -Q veo_queue -P gevent -Ofair --loglevel=info --concurrency=100"
     echo ""
-    echo "ターミナル3 (Flower - オプション):"
+    echo "ターミナル5 (Flower - オプション):"
     echo "  celery -A async_tasks.celery_app flower --port=5555"
     echo ""
 fi
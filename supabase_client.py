@@ -3,19 +3,61 @@ Supabase Client
 データベース接続とヘルパー関数
 """
 from supabase import create_client, Client
+from postgrest.types import ReturnMethod
 from typing import Dict, List, Optional
+import atexit
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import importlib.util
 import os
-from datetime import datetime
+import queue
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
 import logging
+import time
+import httpx
 
 logger = logging.getLogger(__name__)
 
+# HTTP接続プール設定（プロセス全体で1つのkeep-aliveセッションを共有）
+HTTP_MAX_CONNECTIONS = int(os.getenv('SUPABASE_MAX_CONNECTIONS', 50))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('SUPABASE_MAX_KEEPALIVE_CONNECTIONS', 25))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_KEEPALIVE_EXPIRY', 300))
+HTTP_TIMEOUT = float(os.getenv('SUPABASE_HTTP_TIMEOUT', 10))  # 応答のないSupabaseでワーカーが止まらないように
+
+# HTTP/2は h2 パッケージがある場合のみ有効
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# 直接アップロード用のStorageバケット
+STORAGE_BUCKET = os.getenv('SUPABASE_STORAGE_BUCKET', 'uploads')
+STORAGE_URI_PREFIX = 'storage://'
+
+# 非同期書き込み（update_task_async）の設定
+ASYNC_WRITE_QUEUE_SIZE = 256   # 書き込み待ちタスク数の上限
+ASYNC_WRITE_BATCH_SIZE = 16    # 1回にまとめて送信する更新数
+ASYNC_WRITE_CONCURRENCY = int(os.getenv('SUPABASE_WRITE_CONCURRENCY', 4))  # バッチ内で同時に送信する更新数
+
+# 実行中とみなすステータス（非同期の進捗更新はこれらの行にのみ適用する）
+ACTIVE_TASK_STATUSES = ('pending', 'running', 'retry')
+
+# タスク一覧で返す列（UIの一覧表示に必要なものだけ。params や result_metadata は含めない）
+TASK_LIST_COLUMNS = 'id,task_type,status,progress,current_step,result_url,error_message,created_at,completed_at'
+
+
+def now_iso() -> str:
+    """現在時刻をUTC（タイムゾーン付き）のISO 8601文字列で返す"""
+    return datetime.fromtimestamp(time.time(), tz=timezone.utc).isoformat()
+
 
 class SupabaseClient:
     """Supabaseデータベースクライアント"""
 
     def __init__(self):
         """クライアントを初期化"""
+        self._init_async_writer()
+        os.register_at_fork(after_in_child=self._init_async_writer)
+
         self.url = os.getenv('SUPABASE_URL')
         self.key = os.getenv('SUPABASE_SERVICE_KEY')  # サービスロールを使用
 
@@ -26,6 +68,7 @@ class SupabaseClient:
         else:
             try:
                 self.client: Client = create_client(self.url, self.key)
+                self._configure_http_pool()
                 self.mock_mode = False
                 logger.info("Supabase client initialized successfully")
             except Exception as e:
@@ -33,6 +76,133 @@ class SupabaseClient:
                 self.client = None
                 self.mock_mode = True
 
+    def _configure_http_pool(self):
+        """
+        PostgRESTのHTTPセッションを接続プール付きのkeep-aliveクライアントに差し替える
+
+        リクエストごとのTCP/TLSハンドシェイクを避け、同時接続数を上限で抑える。
+        """
+        self._request_count = 0
+        postgrest = self.client.postgrest
+        default_session = postgrest.session
+
+        postgrest.session = httpx.Client(
+            base_url=default_session.base_url,
+            headers=default_session.headers,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            http2=HTTP2_AVAILABLE,
+            event_hooks={'request': [self._count_request]},
+        )
+        default_session.close()
+
+        # プロセス終了時にkeep-alive接続を閉じる
+        atexit.register(postgrest.session.close)
+
+    def _count_request(self, request: httpx.Request):
+        """送信したリクエスト数を記録（統計用）"""
+        self._request_count += 1
+
+    def ping(self) -> bool:
+        """
+        Supabaseへの疎通を確認（プール内の接続を使用）
+
+        Returns:
+            接続できればTrue
+        """
+        if self.mock_mode:
+            return False
+
+        try:
+            self.client.table('tasks').select('id').limit(1).execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Supabase health check failed: {e}")
+            return False
+
+    def get_stats(self) -> Dict:
+        """
+        接続プールの設定と統計を取得
+
+        Returns:
+            統計情報
+        """
+        if self.mock_mode:
+            return {'mock_mode': True}
+
+        return {
+            'mock_mode': False,
+            'http2': HTTP2_AVAILABLE,
+            'max_connections': HTTP_MAX_CONNECTIONS,
+            'max_keepalive_connections': HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            'requests_sent': self._request_count,
+        }
+
+    def create_signed_upload_url(self, path: str) -> Dict:
+        """
+        Storageへの直接アップロード用の署名付きURLを発行
+
+        ブラウザがファイルを直接Storageに送信するため、Flaskはファイル本体を扱わない。
+
+        Args:
+            path: バケット内の保存先パス
+
+        Returns:
+            署名付きURL情報（signed_url, token, path）
+        """
+        if self.mock_mode:
+            raise RuntimeError("Supabase Storage is not configured")
+
+        return self.client.storage.from_(STORAGE_BUCKET).create_signed_upload_url(path)
+
+    def download_file(self, path: str, dest_path: str, chunk_size: int = 1 << 20) -> str:
+        """
+        Storageのファイルをローカルへストリーミングでダウンロード
+
+        同じディレクトリの一時ファイルに書き込んでから置き換えるため、
+        中断されたダウンロードの途中のファイルが dest_path に残ることはなく、
+        同じファイルを同時にダウンロードしても書き込みが混ざらない。
+
+        Args:
+            path: バケット内のパス
+            dest_path: 保存先のローカルパス
+            chunk_size: 読み込み単位（バイト）
+
+        Returns:
+            保存先のローカルパス
+        """
+        if self.mock_mode:
+            raise RuntimeError("Supabase Storage is not configured")
+
+        signed = self.client.storage.from_(STORAGE_BUCKET).create_signed_url(path, 600)
+        url = signed.get('signedURL') or signed.get('signedUrl')
+
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(dest_path) or '.',
+            prefix=f".{os.path.basename(dest_path)}.",
+            suffix='.part'
+        )
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                with httpx.stream('GET', url, timeout=60.0) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_bytes(chunk_size):
+                        f.write(chunk)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        logger.info(f"Downloaded {path} to {dest_path}")
+        return dest_path
+
     def create_task(self, task_data: Dict) -> Dict:
         """
         タスクを作成
@@ -47,8 +217,8 @@ class SupabaseClient:
             # モックモード: ダミーデータを返す
             import uuid
             task_data['id'] = str(uuid.uuid4())
-            task_data['created_at'] = datetime.utcnow().isoformat()
-            task_data['updated_at'] = datetime.utcnow().isoformat()
+            task_data['created_at'] = now_iso()
+            task_data['updated_at'] = now_iso()
             logger.info(f"[MOCK] Created task: {task_data['id']}")
             return task_data
 
@@ -77,7 +247,7 @@ class SupabaseClient:
                 'id': task_id,
                 'status': 'pending',
                 'progress': 0,
-                'created_at': datetime.utcnow().isoformat()
+                'created_at': now_iso()
             }
 
         try:
@@ -102,21 +272,11 @@ class SupabaseClient:
             logger.info(f"[MOCK] Updated task {task_id}: {update_data}")
             task = self.get_task(task_id)
             task.update(update_data)
-            task['updated_at'] = datetime.utcnow().isoformat()
+            task['updated_at'] = now_iso()
             return task
 
         try:
-            update_data['updated_at'] = datetime.utcnow().isoformat()
-
-            # duration_secondsを計算（started_atとcompleted_atがある場合）
-            if 'completed_at' in update_data and 'started_at' not in update_data:
-                # 既存のタスクからstarted_atを取得
-                existing_task = self.get_task(task_id)
-                if existing_task and existing_task.get('started_at'):
-                    started = datetime.fromisoformat(existing_task['started_at'].replace('Z', '+00:00'))
-                    completed = datetime.fromisoformat(update_data['completed_at'].replace('Z', '+00:00'))
-                    update_data['duration_seconds'] = (completed - started).total_seconds()
-
+            # updated_at はトリガー、duration_seconds は生成列でDB側が設定する
             response = self.client.table('tasks').update(update_data).eq('id', task_id).execute()
             task = response.data[0] if response.data else None
             logger.debug(f"Updated task {task_id}")
@@ -125,6 +285,281 @@ class SupabaseClient:
             logger.error(f"Failed to update task {task_id}: {e}")
             raise
 
+    def update_task_minimal(self, task_id: str, update_data: Dict, active_only: bool = False):
+        """
+        タスクを更新（更新後の行を返さない）
+
+        Prefer: return=minimal で送信し、レスポンスの本文とその解析を省く。
+        結果を使わない進捗更新に使う。
+
+        Args:
+            task_id: タスクID
+            update_data: 更新データ
+            active_only: Trueの場合、完了・失敗・キャンセル済みの行は更新しない
+        """
+        if self.mock_mode:
+            self.update_task(task_id, update_data)
+            return
+
+        try:
+            query = self.client.table('tasks').update(
+                update_data, returning=ReturnMethod.minimal
+            ).eq('id', task_id)
+            if active_only:
+                query = query.in_('status', list(ACTIVE_TASK_STATUSES))
+            query.execute()
+            logger.debug(f"Updated task {task_id}")
+        except Exception as e:
+            logger.error(f"Failed to update task {task_id}: {e}")
+            raise
+
+    def mark_task_started(self, task_id: str):
+        """
+        pendingのタスクをrunningにして開始時刻を記録
+
+        並列に実行される複数のタスク（物件動画のクリップなど）が同じ親タスクを開始する場合に使う。
+        pending の行だけを更新するため、最初に開始したものだけが反映され、
+        終了済みの行や開始時刻を書き換えることはない。
+
+        Args:
+            task_id: タスクID
+        """
+        update_data = {'status': 'running', 'started_at': now_iso()}
+
+        if self.mock_mode:
+            if self.get_task(task_id).get('status') == 'pending':
+                self.update_task(task_id, update_data)
+            return
+
+        try:
+            self.client.table('tasks').update(
+                update_data, returning=ReturnMethod.minimal
+            ).eq('id', task_id).eq('status', 'pending').execute()
+            logger.debug(f"Marked task {task_id} as running")
+        except Exception as e:
+            logger.error(f"Failed to mark task {task_id} as running: {e}")
+            raise
+
+    def update_tasks_bulk(self, updates: List[tuple], active_only: bool = False) -> int:
+        """
+        複数タスクの更新をまとめて実行
+
+        PostgRESTは行ごとに異なる値での一括UPDATEをサポートしないため、
+        共有の接続プール上で1件ずつ送信する。書き込みスレッドの起動後は
+        複数の更新を同時に送信し、応答待ちを重ねる（HTTP/2では1本の接続に多重化される）。
+        1件の失敗で残りを止めない。
+
+        Args:
+            updates: (task_id, update_data) のリスト
+            active_only: Trueの場合、完了・失敗・キャンセル済みの行は更新しない
+
+        Returns:
+            成功した更新数
+        """
+        def write(item):
+            task_id, update_data = item
+            try:
+                self.update_task_minimal(task_id, update_data, active_only=active_only)
+                return True
+            except Exception as e:
+                logger.error(f"Failed to update task {task_id} in bulk: {e}")
+                return False
+
+        executor = self._write_executor
+        if executor is not None and len(updates) > 1:
+            try:
+                return sum(executor.map(write, updates))
+            except RuntimeError:
+                # インタプリタ終了時（atexitでのflush）はスレッドプールが停止済みのため順に送信する
+                pass
+        return sum(map(write, updates))
+
+    def _init_async_writer(self):
+        """
+        非同期書き込みの状態を初期化
+
+        fork後の子プロセスでも呼ばれ、親のスレッドが保持していたロックや未送信の更新を引き継がない。
+        """
+        self._write_queue = queue.Queue(maxsize=ASYNC_WRITE_QUEUE_SIZE)  # 書き込み待ちのtask_id
+        self._pending_writes = {}                                       # task_id -> 未送信の更新（最新に統合）
+        self._pending_writes_lock = threading.Lock()
+        self._write_lock = threading.Lock()                             # バッチ送信中は同期書き込みを待たせる
+        self._write_executor = None                                     # バッチ内の更新を同時に送信するスレッドプール
+        self._writer_started = False
+
+    def _ensure_async_writer(self):
+        """書き込みスレッドを起動（最初の非同期書き込み時）"""
+        if self._writer_started:
+            return
+        with self._pending_writes_lock:
+            if self._writer_started:
+                return
+            if ASYNC_WRITE_CONCURRENCY > 1:
+                self._write_executor = ThreadPoolExecutor(
+                    max_workers=ASYNC_WRITE_CONCURRENCY, thread_name_prefix='supabase-write'
+                )
+            threading.Thread(target=self._async_writer_loop, name='supabase-writer', daemon=True).start()
+            # 終了時に未送信の更新を書き込む（HTTPセッションを閉じる前に実行される）
+            atexit.register(self.flush_async_updates)
+            self._writer_started = True
+
+    def _async_writer_loop(self):
+        """キューに積まれた更新をまとめてSupabaseに書き込む"""
+        while True:
+            task_ids = [self._write_queue.get()]
+            try:
+                while len(task_ids) < ASYNC_WRITE_BATCH_SIZE:
+                    task_ids.append(self._write_queue.get_nowait())
+            except queue.Empty:
+                pass
+            self._write_pending(task_ids)
+
+    def _write_pending(self, task_ids=None):
+        """未送信の更新を書き込む（task_ids を省略した場合はすべて）"""
+        with self._write_lock:
+            with self._pending_writes_lock:
+                if task_ids is None:
+                    task_ids = list(self._pending_writes)
+                batch = [
+                    (task_id, self._pending_writes.pop(task_id))
+                    for task_id in dict.fromkeys(task_ids)
+                    if task_id in self._pending_writes
+                ]
+            if batch:
+                try:
+                    # 別プロセスで終了ステータスが先に書き込まれていた場合、古い進捗はDB側で捨てられる
+                    self.update_tasks_bulk(batch, active_only=True)
+                except Exception as e:
+                    logger.error(f"Failed to write task updates to Supabase: {e}")
+
+    def update_task_async(self, task_id: str, update_data: Dict):
+        """
+        タスクをバックグラウンドで更新（応答を待たない）
+
+        進捗など失われても次の書き込みで上書きされる更新に使う。
+        同じタスクの未送信の更新は1件に統合される。終了ステータスは update_task で同期的に書き込むこと。
+
+        Args:
+            task_id: タスクID
+            update_data: 更新データ
+        """
+        self._ensure_async_writer()
+        with self._pending_writes_lock:
+            already_queued = task_id in self._pending_writes
+            self._pending_writes.setdefault(task_id, {}).update(update_data)
+        if not already_queued:
+            try:
+                self._write_queue.put_nowait(task_id)
+            except queue.Full:
+                # 未送信分は次の取り出し（take_pending_update）か終了時の書き込みに含まれる
+                logger.warning(f"Write queue is full; deferring update for {task_id}")
+
+    def take_pending_update(self, task_id: str) -> Dict:
+        """
+        未送信の非同期更新を取り出す（終了時の同期書き込みに含めるため）
+
+        送信中のバッチがあれば完了を待つので、古い進捗が終了ステータスを上書きすることはない。
+
+        Args:
+            task_id: タスクID
+
+        Returns:
+            未送信の更新データ
+        """
+        with self._write_lock:
+            with self._pending_writes_lock:
+                return self._pending_writes.pop(task_id, {})
+
+    def flush_async_updates(self):
+        """未送信の非同期更新をすべて書き込む（プロセス終了時）"""
+        self._write_pending()
+
+    def get_completed_task_by_key(self, cache_key: str) -> Optional[Dict]:
+        """
+        同じ入力で成功済みのタスクを取得（Veo生成結果の再利用用）
+
+        Args:
+            cache_key: 入力内容から計算したキー
+
+        Returns:
+            成功済みタスクの結果（なければNone）
+        """
+        if self.mock_mode:
+            return None
+
+        try:
+            response = (
+                self.client.table('tasks')
+                .select('id,result_path,result_url,result_metadata')
+                .eq('cache_key', cache_key)
+                .eq('status', 'success')
+                .order('completed_at', desc=True)
+                .limit(1)
+                .execute()
+            )
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Failed to look up task by cache key: {e}")
+            return None
+
+    def create_uploaded_file(self, file_data: Dict) -> Optional[Dict]:
+        """
+        アップロードファイルを記録
+
+        Args:
+            file_data: ファイル情報（file_path, file_size, content_hash など）
+
+        Returns:
+            作成されたレコード（失敗時はNone）
+        """
+        if self.mock_mode:
+            logger.info(f"[MOCK] Recorded upload: {file_data.get('file_path')}")
+            return None
+
+        try:
+            response = self.client.table('uploaded_files').insert(file_data).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Failed to record uploaded file: {e}")
+            return None
+
+    def get_file_hash(self, file_path: str, file_size: Optional[int] = None) -> Optional[str]:
+        """
+        アップロード時に計算したSHA-256を取得（ファイルの再読み込みを避けるため）
+
+        同じパスに再アップロードされた場合に備えて最新の記録を使い、
+        記録したサイズが現在のファイルと異なる場合は信用しない。
+
+        Args:
+            file_path: アップロードファイルのパス
+            file_size: 現在のファイルサイズ（記録と一致する場合のみハッシュを返す）
+
+        Returns:
+            SHA-256（16進数、記録がないか一致しなければNone）
+        """
+        if self.mock_mode:
+            return None
+
+        try:
+            response = (
+                self.client.table('uploaded_files')
+                .select('content_hash,file_size')
+                .eq('file_path', file_path)
+                .order('created_at', desc=True)
+                .limit(1)
+                .execute()
+            )
+            if not response.data:
+                return None
+            record = response.data[0]
+            if file_size is not None and record.get('file_size') != file_size:
+                logger.info(f"Recorded size of {file_path} does not match; ignoring stored hash")
+                return None
+            return record.get('content_hash')
+        except Exception as e:
+            logger.error(f"Failed to look up file hash: {e}")
+            return None
+
     def get_user_tasks(self, user_id: str, limit: int = 50, status: str = None) -> List[Dict]:
         """
         ユーザーのタスク一覧を取得
@@ -142,7 +577,7 @@ class SupabaseClient:
             return []
 
         try:
-            query = self.client.table('tasks').select('*').eq('user_id', user_id)
+            query = self.client.table('tasks').select(TASK_LIST_COLUMNS).eq('user_id', user_id)
 
             if status:
                 query = query.eq('status', status)
@@ -168,8 +603,7 @@ class SupabaseClient:
             return 0
 
         try:
-            from datetime import timedelta
-            cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+            cutoff_date = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
 
             response = self.client.table('tasks').delete().lt('created_at', cutoff_date).execute()
             deleted_count = len(response.data) if response.data else 0
@@ -200,25 +634,26 @@ class SupabaseClient:
             }
 
         try:
-            from datetime import timedelta
-            start_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+            start_date = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
 
-            query = self.client.table('tasks').select('status').gte('created_at', start_date)
-
-            if user_id:
-                query = query.eq('user_id', user_id)
-
-            response = query.execute()
-            tasks = response.data
+            try:
+                # 集計はDB側で行い、ステータスごとの件数だけを受け取る
+                response = self.client.rpc('task_stats', {
+                    'uid': user_id,
+                    'since': start_date
+                }).execute()
+                counts = {row['status']: row['n'] for row in response.data}
+            except Exception as e:
+                # task_stats 関数が未作成の環境では、ステータス列だけを取得して1回の走査で数える
+                logger.warning(f"task_stats RPC unavailable, counting in Python: {e}")
+                query = self.client.table('tasks').select('status').gte('created_at', start_date)
+                if user_id:
+                    query = query.eq('user_id', user_id)
+                counts = Counter(row['status'] for row in query.execute().data)
 
-            stats = {
-                'total': len(tasks),
-                'success': sum(1 for t in tasks if t['status'] == 'success'),
-                'failed': sum(1 for t in tasks if t['status'] == 'failed'),
-                'running': sum(1 for t in tasks if t['status'] == 'running'),
-                'pending': sum(1 for t in tasks if t['status'] == 'pending'),
-                'cancelled': sum(1 for t in tasks if t['status'] == 'cancelled'),
-            }
+            stats = {'total': sum(counts.values())}
+            for status in ('success', 'failed', 'running', 'pending', 'cancelled'):
+                stats[status] = counts.get(status, 0)
 
             return stats
         except Exception as e:
@@ -226,5 +661,27 @@ class SupabaseClient:
             return {}
 
 
-# シングルトンインスタンス
-supabase_client = SupabaseClient()
+# シングルトンインスタンス（最初の使用時にプロセスごとに生成）
+_instance: Optional[SupabaseClient] = None
+_instance_lock = threading.Lock()
+
+
+def get_supabase_client(create: bool = True) -> Optional[SupabaseClient]:
+    """
+    SupabaseClientのシングルトンインスタンスを取得
+
+    インポート時にはクライアントを生成しないため、Supabaseを使わないプロセスや
+    コードパスは接続の初期化コストを負担しない。
+
+    Args:
+        create: Falseの場合、未生成ならNoneを返す（終了処理など）
+
+    Returns:
+        SupabaseClientインスタンス
+    """
+    global _instance
+    if _instance is None and create:
+        with _instance_lock:
+            if _instance is None:
+                _instance = SupabaseClient()
+    return _instance
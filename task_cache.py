@@ -0,0 +1,95 @@
+"""
+Task Cache
+タスク状態の短期キャッシュ（Redis）
+
+UIは生成中のタスクを1〜2秒間隔でポーリングするため、
+Supabaseへの読み込みを数秒のTTLでRedisに肩代わりさせる。
+"""
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import redis
+
+logger = logging.getLogger(__name__)
+
+# キャッシュの有効期間（秒）
+TASK_CACHE_TTL = 1
+TASK_LIST_CACHE_TTL = 2
+
+KEY_PREFIX = 'task-cache'
+
+
+class TaskCache:
+    """タスク状態のRedisキャッシュ（Redisに接続できない場合は素通し）"""
+
+    def __init__(self):
+        """Celeryの結果バックエンドと同じRedisを使用"""
+        url = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
+
+        if url.startswith(('redis://', 'rediss://')):
+            # 接続は最初のコマンド実行時に確立される
+            self.redis = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        else:
+            logger.warning("Result backend is not Redis. Task cache disabled.")
+            self.redis = None
+
+    @staticmethod
+    def _task_key(task_id: str) -> str:
+        return f"{KEY_PREFIX}:task:{task_id}"
+
+    @staticmethod
+    def _task_list_key(user_id: str, status: Optional[str], limit: int) -> str:
+        return f"{KEY_PREFIX}:tasks:{user_id}:{status or '*'}:{limit}"
+
+    def _get(self, key: str):
+        if self.redis is None:
+            return None
+        try:
+            value = self.redis.get(key)
+            return json.loads(value) if value is not None else None
+        except Exception as e:
+            logger.warning(f"Task cache read failed: {e}")
+            return None
+
+    def _set(self, key: str, value, ttl: int):
+        if self.redis is None:
+            return
+        try:
+            self.redis.setex(key, ttl, json.dumps(value, default=str))
+        except Exception as e:
+            logger.warning(f"Task cache write failed: {e}")
+
+    def get_task(self, task_id: str) -> Optional[Dict]:
+        """キャッシュ済みのタスクを取得"""
+        return self._get(self._task_key(task_id))
+
+    def set_task(self, task_id: str, task: Dict):
+        """タスクをキャッシュ"""
+        self._set(self._task_key(task_id), task, TASK_CACHE_TTL)
+
+    def get_task_list(self, user_id: str, status: Optional[str], limit: int) -> Optional[List[Dict]]:
+        """キャッシュ済みのタスク一覧を取得"""
+        return self._get(self._task_list_key(user_id, status, limit))
+
+    def set_task_list(self, user_id: str, status: Optional[str], limit: int, tasks: List[Dict]):
+        """タスク一覧をキャッシュ"""
+        self._set(self._task_list_key(user_id, status, limit), tasks, TASK_LIST_CACHE_TTL)
+
+    def invalidate_task(self, *task_ids: str):
+        """
+        タスクのキャッシュを削除（状態変更を即座に反映させる）
+
+        Args:
+            task_ids: データベースタスクID
+        """
+        if self.redis is None or not task_ids:
+            return
+        try:
+            self.redis.delete(*(self._task_key(task_id) for task_id in task_ids))
+        except Exception as e:
+            logger.warning(f"Task cache invalidation failed: {e}")
+
+
+# シングルトンインスタンス
+task_cache = TaskCache()
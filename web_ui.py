@@ -10,8 +10,7 @@ from generate_property_video import PropertyVideoGenerator
 from frame_editor import FrameEditor, AIFrameEditor
 from pathlib import Path
 from async_tasks import property_video_generation_task
-from supabase_client import supabase_client
-from datetime import datetime
+from supabase_client import get_supabase_client, now_iso
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -142,7 +141,7 @@ def generate_video():
     try:
         # Create Supabase task record
         num_api_calls = len(image_paths)
-        db_task = supabase_client.create_task({
+        db_task = get_supabase_client().create_task({
             'task_type': 'property_video_generation',
             'status': 'pending',
             'progress': 0,
@@ -153,7 +152,7 @@ def generate_video():
                 'num_images': num_api_calls,
                 'api_calls_required': num_api_calls
             },
-            'created_at': datetime.utcnow().isoformat()
+            'created_at': now_iso()
         })
 
         db_task_id = db_task['id']